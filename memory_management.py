@@ -2,14 +2,103 @@ import time
 import threading
 import random
 import re
+import functools
 from collections import OrderedDict
 import heapq
+import itertools
 import logging
 import gc
 import weakref
 from typing import Literal,Optional
 import sys
-from pympler import asizeof
+try:
+    from pympler import asizeof
+except ImportError:  # 只有 accurate_sizing=True 時才需要 pympler
+    asizeof = None
+
+# 容器遞迴估算的最大深度，只作為過深結構的保險；循環與共用參照由 id() 去重處理
+MAX_SIZE_DEPTH = 16
+# LFU 的訪問次數先累積在各執行緒的緩衝區，單一 key 或緩衝區大小達到此值時才寫回
+LFU_FLUSH_THRESHOLD = 64
+# 固定大小的型別，第一次計算後快取
+_FIXED_SIZES = {}
+_FIXED_SIZE_TYPES = (float, bool, complex, type(None))
+# 型別 -> 其 MRO 上所有 __slots__ 屬性名稱，第一次遇到時計算
+_SLOT_NAMES = {}
+
+_now = time.monotonic
+
+class _Entry:
+    """A cache entry; deadline is an absolute time.monotonic() value."""
+    __slots__ = ('value', 'deadline', 'permanent', 'size', 'is_weak')
+
+    def __init__(self, value, deadline, permanent, size, is_weak):
+        self.value = value
+        self.deadline = deadline
+        self.permanent = permanent
+        self.size = size
+        self.is_weak = is_weak
+
+# 重複使用已編譯的正規表示式
+_compile_pattern = functools.lru_cache(maxsize=128)(re.compile)
+
+@functools.lru_cache(maxsize=128)
+def _literal_prefix(pattern):
+    """Return the literal prefix if re.match(pattern, key) is equivalent to key.startswith(prefix), else None."""
+    prefix = pattern[:-2] if pattern.endswith('.*') else pattern
+    if re.escape(prefix) != prefix:
+        return None
+    return prefix
+
+def _slot_names(t):
+    names = _SLOT_NAMES.get(t)
+    if names is None:
+        names = []
+        for cls in t.__mro__:
+            slots = cls.__dict__.get('__slots__', ())
+            if isinstance(slots, str):
+                slots = (slots,)
+            names.extend(name for name in slots if name not in ('__dict__', '__weakref__'))
+        names = _SLOT_NAMES[t] = tuple(names)
+    return names
+
+def _fast_size(obj, _seen=None, _depth=0):
+    """以 sys.getsizeof() 快速估算物件大小，容器會遞迴加總其內容，同一物件只計算一次。"""
+    if _seen is None:
+        _seen = set()
+    # 與 asizeof 相同，共用或循環參照的物件只計入第一次遇到的位置
+    obj_id = id(obj)
+    if obj_id in _seen:
+        return 0
+    _seen.add(obj_id)
+    t = type(obj)
+    size = _FIXED_SIZES.get(t)
+    if size is not None:
+        return size
+    if t in _FIXED_SIZE_TYPES:
+        size = _FIXED_SIZES[t] = sys.getsizeof(obj)
+        return size
+    size = sys.getsizeof(obj)
+    if t is str or t is bytes or t is int or _depth >= MAX_SIZE_DEPTH:
+        return size
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            size += _fast_size(k, _seen, _depth + 1) + _fast_size(v, _seen, _depth + 1)
+    elif isinstance(obj, (tuple, list, set, frozenset)):
+        for item in obj:
+            size += _fast_size(item, _seen, _depth + 1)
+    else:
+        # 一般物件：加總 __dict__ 與已設定的 __slots__ 屬性
+        attrs = getattr(obj, '__dict__', None)
+        if type(attrs) is dict:
+            size += _fast_size(attrs, _seen, _depth + 1)
+        for name in _slot_names(t):
+            try:
+                value = getattr(obj, name)
+            except AttributeError:
+                continue  # 尚未設定的 slot
+            size += _fast_size(value, _seen, _depth + 1)
+    return size
 
 class Redis:
     UNIT_MULTIPLIERS = {
@@ -17,20 +106,67 @@ class Redis:
         'MB': 1024**2,
         'GB': 1024**3
     }
-    def __init__(self, max_size=512, unit: Optional[Literal['KB', 'MB', 'GB']] = 'MB', default_expiration_time=3600, cleanup_interval=10, cleanup_fraction=0.25, verbose=False, cleanup_strategy:Optional[Literal['LRU','LFU','FIFO','SizeBased','Random']]='LRU'):
+    # 清理策略 -> _cleanup_* / _evict_one_* 方法名稱的後綴
+    CLEANUP_STRATEGIES = {
+        'LRU': 'lru',
+        'LFU': 'lfu',
+        'FIFO': 'fifo',
+        'SizeBased': 'size_based',
+        'Random': 'random'
+    }
+    def __init__(self, max_size=512, unit: Optional[Literal['KB', 'MB', 'GB']] = 'MB', default_expiration_time=3600, cleanup_interval=10, cleanup_fraction=0.25, verbose=False, cleanup_strategy:Optional[Literal['LRU','LFU','FIFO','SizeBased','Random']]='LRU', accurate_sizing=False, gc_every_n=10):
         if unit not in self.UNIT_MULTIPLIERS:
             raise ValueError(f"Invalid unit '{unit}'. Use 'KB', 'MB', or 'GB'.")
+        if cleanup_strategy is None:
+            cleanup_strategy = 'LRU'
+        if cleanup_strategy not in self.CLEANUP_STRATEGIES:
+            raise ValueError(f"Invalid cleanup_strategy '{cleanup_strategy}'. Use one of {', '.join(self.CLEANUP_STRATEGIES)}.")
+        if accurate_sizing and asizeof is None:
+            raise ImportError("accurate_sizing=True requires pympler to be installed.")
         self.cache = OrderedDict()
-        self.lock = threading.RLock()
+        # 所有方法都不會重入 lock，使用較輕量的 Lock 而非 RLock
+        self.lock = threading.Lock()
         self.max_size = max_size * self.UNIT_MULTIPLIERS[unit]
         self.default_expiration_time = default_expiration_time
         self.cleanup_interval = cleanup_interval
         self.cleanup_fraction = cleanup_fraction
+        # 完整的 gc.collect() 最多每 gc_every_n 次清理執行一次
+        self.gc_every_n = gc_every_n
+        # (deadline, version, key) 的最小堆積，版本號與 _key_version 不符的紀錄視為已失效
         self.expiration_heap = []
+        self._key_version = {}
         self.verbose = verbose
-        self.cleanup_loop_thread =True
+        self._stop_event = threading.Event()
         self.cleanup_strategy = cleanup_strategy
+        # 在初始化時決定策略對應的方法，避免每次呼叫都比對字串
+        suffix = self.CLEANUP_STRATEGIES[cleanup_strategy]
+        self._cleanup_fn = getattr(self, f'_cleanup_{suffix}')
+        self._evict_one = getattr(self, f'_evict_one_{suffix}')
+        self._track = getattr(self, f'_track_{suffix}')
+        self._get = getattr(self, f'_get_{suffix}')
+        # 子類別沒有覆寫 get 時，直接綁定策略專用的實作，省去一層轉呼叫
+        if type(self).get is Redis.get:
+            self.get = self._get
+        # LFU 的訪問次數以執行緒區域緩衝區批次寫回
+        self._count_reads = cleanup_strategy == 'LFU'
+        self._tls = threading.local()
+        # 所有執行緒的 (thread, 緩衝區)，驅逐與清理前在 lock 內全部寫回
+        self._lfu_buffers = []
+        self.accurate_sizing = accurate_sizing
         self.access_frequency = {}
+        # LFU: 訪問次數 -> 依插入順序排列的 key，並記錄目前最小的訪問次數
+        self.freq_buckets = {}
+        self.min_freq = 0
+        # SizeBased: (-size, version, key) 的最大堆積，以版本號做延遲刪除
+        self._size_heap = []
+        self._size_ver = {}
+        # Random: 非永久 key 的陣列與其索引，刪除時與最後一個元素交換，取樣不需複製整個 key 列表
+        self._keys_list = []
+        self._key_index = {}
+        # 兩個堆積共用的版本號來源，同時避免比較到 key 本身
+        self._version_counter = itertools.count()
+        self._current_size = 0
+        self._permanent_count = 0
 
         if self.verbose:
             logging.basicConfig(level=logging.DEBUG)
@@ -43,15 +179,19 @@ class Redis:
         return self
     
     def close(self):
-        self.cleanup_loop_thread = False
+        # 喚醒清理執行緒並等待其結束，重複呼叫也是安全的
+        self._stop_event.set()
+        self._cleanup_thread.join()
         
     def __exit__(self, exc_type, exc_value, traceback):
         self.close()
         
     def _get_size(self, obj):
-        """使用 pympler.asizeof() 計算物件大小，忽略不支持的類型。"""
+        """計算物件大小，預設使用 _fast_size()，accurate_sizing=True 時改用 pympler.asizeof()，忽略不支持的類型。"""
         try:
-            return asizeof.asizeof(obj)
+            if self.accurate_sizing:
+                return asizeof.asizeof(obj)
+            return _fast_size(obj)
         except TypeError as e:
             # 忽略 '_EmptyListener' 相關的錯誤，不記錄日志
             if 'cannot create weak reference to \'_EmptyListener\'' in str(e):
@@ -64,225 +204,424 @@ class Redis:
             logging.error(f"Unexpected error calculating size of object: {e}. Returning 0 size.")
             return 0
 
-    def _get_current_size(self):
-        """Get the total size of all cache entries."""
-        total_size = 0
-        with self.lock:
-            for k, v in self.cache.items():
-                total_size += self._get_size(k) + self._get_size(v[0])  # Include only the value's size
-        return total_size
+    def _remove_entry(self, key):
+        """Remove a key from the cache and release its cached size. Caller must hold the lock."""
+        entry = self.cache.pop(key)
+        self._current_size -= entry.size
+        if entry.permanent:
+            self._permanent_count -= 1
+        freq = self.access_frequency.pop(key, None)
+        if freq is not None:
+            bucket = self.freq_buckets[freq]
+            del bucket[key]
+            if not bucket:
+                del self.freq_buckets[freq]
+        # 堆積中的舊紀錄會在取出時因版本不符而被略過
+        self._size_ver.pop(key, None)
+        self._key_version.pop(key, None)
+        index = self._key_index.pop(key, None)
+        if index is not None:
+            last_key = self._keys_list.pop()
+            if index < len(self._keys_list):  # 被刪除的不是最後一個元素
+                self._keys_list[index] = last_key
+                self._key_index[last_key] = index
+        return entry
+
+    def _lfu_add(self, key):
+        """Register a newly inserted key with access frequency 1."""
+        self.access_frequency[key] = 1
+        bucket = self.freq_buckets.get(1)
+        if bucket is None:
+            bucket = self.freq_buckets[1] = OrderedDict()
+        bucket[key] = None
+        self.min_freq = 1
+
+    def _lfu_touch(self, key, count=1):
+        """Move a key from its frequency bucket up by count accesses."""
+        freq = self.access_frequency.get(key)
+        if freq is None:  # 永久項目或已被移除的 key 不參與 LFU
+            return
+        new_freq = freq + count
+        bucket = self.freq_buckets[freq]
+        del bucket[key]
+        emptied_min = not bucket and self.min_freq == freq
+        if not bucket:
+            del self.freq_buckets[freq]
+        self.access_frequency[key] = new_freq
+        bucket = self.freq_buckets.get(new_freq)
+        if bucket is None:
+            bucket = self.freq_buckets[new_freq] = OrderedDict()
+        bucket[key] = None
+        if emptied_min:
+            # 一次跳過多個頻率時，中間可能還有其他 bucket
+            self.min_freq = new_freq if count == 1 else min(self.freq_buckets)
+
+    def _lfu_record(self, key):
+        """Count a read in this thread's buffer and flush the buffers once it reaches LFU_FLUSH_THRESHOLD."""
+        try:
+            buffer = self._tls.lfu_buffer
+        except AttributeError:
+            buffer = self._tls.lfu_buffer = {}
+            with self.lock:
+                self._lfu_buffers.append((threading.current_thread(), buffer))
+        count = buffer.get(key, 0) + 1
+        buffer[key] = count
+        if count >= LFU_FLUSH_THRESHOLD or len(buffer) >= LFU_FLUSH_THRESHOLD:
+            with self.lock:
+                self._lfu_flush()
+
+    def _lfu_flush(self):
+        """Apply every thread's buffered reads to the frequency buckets. Caller must hold the lock."""
+        live = []
+        for thread, buffer in self._lfu_buffers:
+            # 擁有者可能同時在累加，popitem() 逐筆取出不會遺失新寫入的次數
+            while buffer:
+                try:
+                    key, count = buffer.popitem()
+                except KeyError:
+                    break
+                self._lfu_touch(key, count)
+            # 已結束的執行緒不會再寫入，寫回後即可丟棄其緩衝區
+            if thread.is_alive():
+                live.append((thread, buffer))
+        self._lfu_buffers = live
+
+    def _lfu_victim(self):
+        """Return the least frequently used key (oldest first among ties)."""
+        bucket = self.freq_buckets.get(self.min_freq)
+        if bucket is None:
+            # delete/過期可能清空最小頻率的 bucket，此時重新找出最小值
+            self.min_freq = min(self.freq_buckets)
+            bucket = self.freq_buckets[self.min_freq]
+        return next(iter(bucket))
+
+    def _size_add(self, key, size):
+        """Push a key onto the size heap with a fresh version."""
+        version = next(self._version_counter)
+        self._size_ver[key] = version
+        heapq.heappush(self._size_heap, (-size, version, key))
+
+    def _size_victim(self):
+        """Pop and return the largest live key, or None if the heap holds only stale entries."""
+        while self._size_heap:
+            _, version, key = heapq.heappop(self._size_heap)
+            if self._size_ver.get(key) == version and key in self.cache:
+                return key
+        return None
+
+    def _expire_at(self, key, deadline):
+        """Schedule a key on the expiration heap, invalidating any earlier record for it."""
+        version = next(self._version_counter)
+        self._key_version[key] = version
+        heapq.heappush(self.expiration_heap, (deadline, version, key))
+
+    def _compact_heaps(self):
+        """Drop stale records once a heap holds more than twice as many records as the cache has keys."""
+        limit = 2 * len(self.cache)
+        if len(self.expiration_heap) > limit:
+            versions = self._key_version
+            self.expiration_heap = [record for record in self.expiration_heap if versions.get(record[2]) == record[1]]
+            heapq.heapify(self.expiration_heap)
+        if len(self._size_heap) > limit:
+            versions = self._size_ver
+            self._size_heap = [record for record in self._size_heap if versions.get(record[2]) == record[1]]
+            heapq.heapify(self._size_heap)
 
     def _cleanup(self):
-        current_time = time.time()
+        """Run one cleanup pass and return the number of bytes freed."""
+        current_time = _now()
         with self.lock:
+            size_before = self._current_size
             # Remove expired items
-            while self.expiration_heap and self.expiration_heap[0][0] < current_time:
-                _, key = heapq.heappop(self.expiration_heap)
-                if key in self.cache and not self.cache[key][3]:  # Check if key is still in cache and not permanent
-                    del self.cache[key]
+            while self.expiration_heap and self.expiration_heap[0][0] <= current_time:
+                _, version, key = heapq.heappop(self.expiration_heap)
+                # 版本相符代表 key 仍在快取中、未被覆寫，且不是永久項目
+                if self._key_version.get(key) == version:
+                    self._remove_entry(key)
                     logging.debug(f"Cleaned up expired key: {key}")
 
-            if self.cleanup_strategy == 'LRU':
-                self._cleanup_lru()
-            elif self.cleanup_strategy == 'LFU':
-                self._cleanup_lfu()
-            elif self.cleanup_strategy == 'FIFO':
-                self._cleanup_fifo()
-            elif self.cleanup_strategy == 'SizeBased':
-                self._cleanup_size_based()
-            elif self.cleanup_strategy == 'Random':
-                self._cleanup_random()
-                        
+            if self._count_reads:
+                self._lfu_flush()
+            self._cleanup_fn()
+            self._compact_heaps()
+            return size_before - self._current_size
+
     def _cleanup_lru(self):
         # Remove the least recently used items
         if len(self.cache) > self.max_size * self.cleanup_fraction:
             num_to_delete = int(len(self.cache) * self.cleanup_fraction)
             for _ in range(num_to_delete):
-                key, _ = self.cache.popitem(last=False)
+                key = self._evict_one_lru()
+                if key is None:
+                    break
                 logging.debug(f"LRU Cleaned: {key}")
 
     def _cleanup_lfu(self):
         # Remove the least frequently used items
         if len(self.cache) > self.max_size * self.cleanup_fraction:
             num_to_delete = int(len(self.cache) * self.cleanup_fraction)
-            # Sort by access frequency
-            least_used_keys = sorted(self.access_frequency, key=self.access_frequency.get)[:num_to_delete]
-            for key in least_used_keys:
-                if key in self.cache:
-                    del self.cache[key]
-                    del self.access_frequency[key]
-                    logging.debug(f"LFU Cleaned: {key}")
+            for _ in range(num_to_delete):
+                key = self._evict_one_lfu()
+                if key is None:
+                    break
+                logging.debug(f"LFU Cleaned: {key}")
 
     def _cleanup_fifo(self):
         # Remove the first items that were added
         if len(self.cache) > self.max_size * self.cleanup_fraction:
             num_to_delete = int(len(self.cache) * self.cleanup_fraction)
             for _ in range(num_to_delete):
-                key, _ = self.cache.popitem(last=False)  # FIFO is similar to LRU if you remove from the front
+                key = self._evict_one_fifo()  # FIFO is similar to LRU if you remove from the front
+                if key is None:
+                    break
                 logging.debug(f"FIFO Cleaned: {key}")
 
     def _cleanup_size_based(self):
         # Remove items based on size, e.g., largest first
         if len(self.cache) > self.max_size * self.cleanup_fraction:
             num_to_delete = int(len(self.cache) * self.cleanup_fraction)
-            # Sort by size (largest first)
-            sorted_items = sorted(self.cache.items(), key=lambda item: len(str(item[0])) + len(str(item[1][0])), reverse=True)
-            for i in range(num_to_delete):
-                key = sorted_items[i][0]
-                del self.cache[key]
+            for _ in range(num_to_delete):
+                key = self._evict_one_size_based()
+                if key is None:
+                    break
                 logging.debug(f"SizeBased Cleaned: {key}")
 
     def _cleanup_random(self):
         # Randomly remove items
         if len(self.cache) > self.max_size * self.cleanup_fraction:
             num_to_delete = int(len(self.cache) * self.cleanup_fraction)
-            keys_to_delete = random.sample(list(self.cache.keys()), num_to_delete)
+            keys_list = self._keys_list
+            num_to_delete = min(num_to_delete, len(keys_list))
+            # 先取出 key，因為每次刪除都會調整陣列中的位置
+            keys_to_delete = [keys_list[i] for i in random.sample(range(len(keys_list)), num_to_delete)]
             for key in keys_to_delete:
-                if key in self.cache:
-                    del self.cache[key]
-                    logging.debug(f"Randomly Cleaned: {key}")
+                self._remove_entry(key)
+                logging.debug(f"Randomly Cleaned: {key}")
+
+    # _evict_one_* 移除一個非永久項目並回傳其 key，只剩永久項目時回傳 None。呼叫端需持有 lock。
+    def _evict_one_lru(self):
+        # 最久未使用的項目位於 OrderedDict 的最前面，永久項目移到尾端略過
+        if len(self.cache) <= self._permanent_count:
+            return None
+        key = next(iter(self.cache))
+        while self.cache[key].permanent:
+            self.cache.move_to_end(key)
+            key = next(iter(self.cache))
+        self._remove_entry(key)
+        return key
+
+    def _evict_one_lfu(self):
+        # 永久項目不會放入 freq_buckets
+        if not self.freq_buckets:
+            return None
+        key = self._lfu_victim()
+        self._remove_entry(key)
+        return key
+
+    def _evict_one_fifo(self):
+        # 插入順序即 OrderedDict 的順序
+        return self._evict_one_lru()
+
+    def _evict_one_size_based(self):
+        # 永久項目不會放入大小堆積
+        key = self._size_victim()
+        if key is not None:
+            self._remove_entry(key)
+        return key
+
+    def _evict_one_random(self):
+        # 永久項目不會放入 _keys_list
+        if not self._keys_list:
+            return None
+        key = self._keys_list[random.randrange(len(self._keys_list))]
+        self._remove_entry(key)
+        return key
 
     def _start_cleanup_thread(self):
         def cleanup_loop():
-            while self.cleanup_loop_thread:
-                logging.debug(f"Waiting for cleanup interval: {self.cleanup_interval} seconds")
-                time.sleep(self.cleanup_interval)
-                start_time = time.time()
-                self._cleanup()
-                end_time = time.time()
-                collected = gc.collect()
-                logging.debug("Garbage collector: collected %d objects in %.2f seconds." % (collected, end_time - start_time))
+            logging.debug(f"Waiting for cleanup interval: {self.cleanup_interval} seconds")
+            # Event.wait() 在 close() 時會立即返回，不必等完整個 cleanup_interval
+            cycles_since_full_gc = 0
+            while not self._stop_event.wait(self.cleanup_interval):
+                start_time = time.monotonic()
+                freed = self._cleanup()
+                end_time = time.monotonic()
+                cycles_since_full_gc += 1
+                # 只有釋放超過 1% 的空間才觸發 GC，平常只收集最年輕的世代
+                if freed > self.max_size * 0.01:
+                    if cycles_since_full_gc >= self.gc_every_n:
+                        collected = gc.collect()
+                        cycles_since_full_gc = 0
+                    else:
+                        collected = gc.collect(generation=0)
+                    logging.debug("Garbage collector: collected %d objects in %.2f seconds." % (collected, end_time - start_time))
         
-        cleanup_thread = threading.Thread(target=cleanup_loop, daemon=True)
-        cleanup_thread.start()
+        self._cleanup_thread = threading.Thread(target=cleanup_loop, daemon=True)
+        self._cleanup_thread.start()
 
     def _evict_if_needed(self, new_entry_size):
-        evicted_any = False
-        with self.lock:
-            for _ in range(len(self.cache)):
-                if self._get_current_size() + new_entry_size <= self.max_size:
-                    break
-                key, value = next(iter(self.cache.items()))
-                if not value[3]:  # 如果該項目不是永久的，則移除
-                    if self.cleanup_strategy == 'LRU':
-                        key, _ = self.cache.popitem(last=False)
-                    elif self.cleanup_strategy == 'LFU':
-                        least_used_key = min(self.access_frequency, key=self.access_frequency.get)
-                        self.cache.pop(least_used_key, None)
-                        self.access_frequency.pop(least_used_key, None)
-                    elif self.cleanup_strategy == 'FIFO':
-                        key, _ = self.cache.popitem(last=False)
-                    elif self.cleanup_strategy == 'SizeBased':
-                        largest_key = max(self.cache, key=lambda k: self._get_size(k) + self._get_size(self.cache[k][0]))
-                        self.cache.pop(largest_key, None)
-                    elif self.cleanup_strategy == 'Random':
-                        random_key = random.choice(list(self.cache.keys()))
-                        self.cache.pop(random_key, None)
-                    else:
-                        # Default to LRU if no strategy matches
-                        key, _ = self.cache.popitem(last=False)
-                    logging.debug(f"Evicted: {key}")
-                    evicted_any = True
-                else:
-                    self.cache.move_to_end(key)
-                logging.debug(f"Evicting... Current Cache Size: {self._get_current_size()}")
-        return evicted_any
+        """Evict entries until new_entry_size fits. Caller must hold the lock; returns the evicted keys."""
+        evicted = []
+        while self._current_size + new_entry_size > self.max_size:
+            key = self._evict_one()
+            if key is None:  # 只剩永久項目
+                break
+            evicted.append(key)
+        return evicted
 
     def set(self, key, value, expiration_time=None, permanent=False, use_weakref=False):
         if expiration_time is None:
             expiration_time = self.default_expiration_time
+        # 在取得 lock 之前計算大小，縮短持有 lock 的時間
+        entry_size = self._get_size(key) + self._get_size(value)  # 使用 _get_size 計算大小，只計算一次並存入項目
+        logging.debug(f"Attempting to set {key} with size {entry_size}. Current cache size: {self._current_size}, Max size: {self.max_size}")
+        
+        if entry_size > self.max_size:
+            logging.debug(f"Warning: Entry size for {key} is too large, cannot fit into the cache")
+            return
+        
+        if use_weakref:
+            value = weakref.ref(value)
+        entry = _Entry(value, _now() + expiration_time, permanent, entry_size, use_weakref)
+        
         with self.lock:
-            entry_size = self._get_size(key) + self._get_size(value)  # 使用 _get_size 計算大小
-            current_size = self._get_current_size()
-            logging.debug(f"Attempting to set {key} with size {entry_size}. Current cache size: {current_size}, Max size: {self.max_size}")
-            
-            if entry_size > self.max_size:
-                logging.debug(f"Warning: Entry size for {key} is too large, cannot fit into the cache")
-                return
-            
-            while current_size + entry_size > self.max_size:
-                if not self.cache or not self._evict_if_needed(entry_size):
-                    logging.debug(f"Warning: Cannot evict enough space for {key}. All items are permanent.")
-                    return
-                current_size = self._get_current_size()
-                
-            if use_weakref:
-                value = weakref.ref(value)
-                
-            self.cache[key] = (value, expiration_time, time.time(), permanent)
-            if not permanent:
-                heapq.heappush(self.expiration_heap, (time.time() + expiration_time, key))
-            self.cache.move_to_end(key)  # Move the new item to the end
-            
-            # 根據策略更新訪問和排序資訊
-            if self.cleanup_strategy == 'LFU':
-                # 初始化訪問次數為 0
-                self.access_frequency[key] = 0
-            elif self.cleanup_strategy == 'LRU':
-                # 將項目移到尾部，標記為最近使用
-                self.cache.move_to_end(key)
-            elif self.cleanup_strategy == 'FIFO':
-                # FIFO 順序由 OrderedDict 自動維持
-                pass
-            elif self.cleanup_strategy == 'SizeBased':
-                # SizeBased 會在清理時處理，不需要在 set 時更新
-                pass
-            elif self.cleanup_strategy == 'Random':
-                # Random 策略不需特殊處理
-                pass
+            if self._count_reads:
+                # 驅逐前先寫回所有執行緒累積的訪問次數
+                self._lfu_flush()
+            # 覆寫既有的 key 時先釋放舊項目的大小
+            if key in self.cache:
+                self._remove_entry(key)
             
-            logging.debug(f"Set: {key} - Current Cache Size: {self._get_current_size()}")
+            evicted = self._evict_if_needed(entry_size)
+            stored = self._current_size + entry_size <= self.max_size
+            if stored:
+                self._store(key, entry)
+            current_size = self._current_size
+        
+        # 日誌在釋放 lock 之後輸出
+        for evicted_key in evicted:
+            logging.debug(f"Evicted: {evicted_key}")
+        if not stored:
+            logging.debug(f"Warning: Cannot evict enough space for {key}. All items are permanent.")
+            return
+        logging.debug(f"Set: {key} - Current Cache Size: {current_size}")
+
+    def _store(self, key, entry):
+        """Insert a new entry and update the strategy bookkeeping. Caller must hold the lock."""
+        # set() 會先移除舊的 key，所以這裡一定是新插入，OrderedDict 已將其放在尾部
+        self.cache[key] = entry
+        self._current_size += entry.size
+        if entry.permanent:
+            # 永久項目不會被驅逐，不放入 LFU / SizeBased 的索引
+            self._permanent_count += 1
+            return
+        self._expire_at(key, entry.deadline)
+        # 根據策略更新訪問和排序資訊
+        self._track(key, entry)
+
+    # _track_* 在插入非永久項目後更新策略專用的索引。呼叫端需持有 lock。
+    def _track_lru(self, key, entry):
+        # 新插入的項目已在尾部，LRU / FIFO 順序由 OrderedDict 自動維持
+        pass
+
+    _track_fifo = _track_lru
+
+    def _track_lfu(self, key, entry):
+        # 初始化訪問次數為 1
+        self._lfu_add(key)
+
+    def _track_size_based(self, key, entry):
+        # 記錄到大小堆積，清理時直接取出最大的項目
+        self._size_add(key, entry.size)
+
+    def _track_random(self, key, entry):
+        # 加入隨機取樣用的陣列
+        self._key_index[key] = len(self._keys_list)
+        self._keys_list.append(key)
 
     def get(self, key):
+        """取得快取值，不存在或已過期時回傳 None。"""
+        return self._get(key)
+
+    # _get_* 是各策略的 get 實作，__init__ 會將其中一個綁定為 self._get。
+    def _get_lru(self, key):
         with self.lock:
-            if key not in self.cache:
-                logging.debug(f"Get: {key} - Cache miss")
-                return None
-            
-            # 取得快取項目
-            value_tuple = self.cache[key]
-            current_time = time.time()
-            
-            # 檢查項目是否過期且不是永久性
-            if current_time - value_tuple[2] > value_tuple[1] and not value_tuple[3]:
-                del self.cache[key]
-                if key in self.access_frequency:
-                    del self.access_frequency[key]
-                logging.debug(f"Get: {key} - Item expired")
-                return None
-            
-            # 更新策略相關資料
-            if self.cleanup_strategy == 'LFU':
-                # 更新訪問頻率
-                self.access_frequency[key] = self.access_frequency.get(key, 0) + 1
-            elif self.cleanup_strategy == 'LRU':
-                # 更新最近使用順序
-                self.cache.move_to_end(key)
-            
-            # 如果項目為弱參考，檢查其是否已被回收
-            value = value_tuple[0]
-            if isinstance(value, weakref.ReferenceType):
-                value = value()
-            
-            logging.debug(f"Get: {key} - Cache hit")
-            return value
+            entry = self.cache.get(key)
+            if entry is not None:
+                # 檢查項目是否過期且不是永久性
+                if entry.deadline <= _now() and not entry.permanent:
+                    self._remove_entry(key)
+                    entry = None
+                else:
+                    # 更新最近使用順序
+                    self.cache.move_to_end(key)
+        if entry is None:
+            logging.debug(f"Get: {key} - Cache miss")
+            return None
+        return self._hit(key, entry)
+
+    def _get_unordered(self, key):
+        # FIFO / SizeBased / Random：dict 讀取在 GIL 下是原子操作，命中時不需取得 lock
+        try:
+            entry = self.cache[key]
+        except KeyError:
+            logging.debug(f"Get: {key} - Cache miss")
+            return None
+        if entry.deadline <= _now() and not entry.permanent:
+            return self._expired(key, entry)
+        return self._hit(key, entry)
+
+    _get_fifo = _get_size_based = _get_random = _get_unordered
+
+    def _get_lfu(self, key):
+        # 與 _get_unordered 相同，命中時另外在執行緒緩衝區累計訪問次數
+        try:
+            entry = self.cache[key]
+        except KeyError:
+            logging.debug(f"Get: {key} - Cache miss")
+            return None
+        if entry.deadline <= _now() and not entry.permanent:
+            return self._expired(key, entry)
+        self._lfu_record(key)
+        return self._hit(key, entry)
+
+    def _expired(self, key, entry):
+        with self.lock:
+            # 取得 lock 前可能已被其他執行緒覆寫
+            if self.cache.get(key) is entry:
+                self._remove_entry(key)
+        logging.debug(f"Get: {key} - Item expired")
+        return None
+
+    def _hit(self, key, entry):
+        logging.debug(f"Get: {key} - Cache hit")
+        # 如果項目為弱參考，回傳其指向的物件（已被回收時為 None）
+        if entry.is_weak:
+            return entry.value()
+        return entry.value
 
     def delete(self, key):
         with self.lock:
             if key in self.cache:
-                del self.cache[key]
+                # 同時移除 LFU 的訪問頻率並扣除快取大小
+                self._remove_entry(key)
                 logging.debug(f"Delete: {key}")
-            # Remove from frequency map if using LFU
-                if key in self.access_frequency:
-                    del self.access_frequency[key]
                 
     def expire_matching_keys(self, pattern):
+        prefix = _literal_prefix(pattern)
+        if prefix is not None:
+            # 常見的 'session:.*' 這類前綴樣式直接用 startswith 比對
+            matches = lambda key: key.startswith(prefix)
+        else:
+            matches = _compile_pattern(pattern).match
         with self.lock:
-            regex = re.compile(pattern)
-            keys_to_expire = [key for key in self.cache.keys() if regex.match(key)]
-            for key in keys_to_expire:
-                if key in self.cache:
-                    self.cache[key] = (self.cache[key][0], 0, time.time(), self.cache[key][3])
+            now = _now()
+            # 只修改項目的 deadline，迭代期間不會改變 cache 本身
+            for key, entry in self.cache.items():
+                if matches(key):
+                    entry.deadline = now
+                    if not entry.permanent:
+                        self._expire_at(key, now)
                     logging.debug(f"Expired key: {key}")
 
 def test():
@@ -303,6 +642,32 @@ def test():
 
     print("Passed size unit tests.\n")
 
+    # 測試大小估算：共用與循環參照只計算一次
+    print("Testing size estimation of shared and cyclic references...")
+    shared = 'v' * 1024
+    shared_list = [shared] * 1000
+    assert _fast_size(shared_list) == sys.getsizeof(shared_list) + sys.getsizeof(shared), "Expected a shared element to be counted once."
+    cyclic = {}
+    cyclic['self'] = cyclic
+    cyclic['children'] = [{'parent': cyclic} for _ in range(30)]
+    assert _fast_size(cyclic) < 64 * 1024, "Expected a self-referencing container to be counted once per object."
+
+    class Holder:
+        def __init__(self, data):
+            self.data = data
+
+    class SlotHolder:
+        __slots__ = ('data', 'unset')
+
+        def __init__(self, data):
+            self.data = data
+
+    floats = [float(i) for i in range(100000)]
+    assert _fast_size(Holder(floats)) > _fast_size(floats), "Expected instance attributes to be included in the size."
+    assert _fast_size(SlotHolder(floats)) > _fast_size(floats), "Expected slot attributes to be included in the size."
+
+    print("Passed size estimation tests.\n")
+
     # 測試過期項目和清理策略
     print("Testing expiration and cleanup strategies...")
     cache = Redis(max_size=0.0001, unit='MB', default_expiration_time=3, cleanup_interval=1, cleanup_fraction=0.5, verbose=True)  # 設置最大大小為0.0001 MB（100字節），默認過期時間為3秒
@@ -9,6 +9,7 @@ class AsyncioController:
         self.tasks: List[asyncio.Task] = []
         self.verbose = verbose
         self.stop = False
+        self._stop = asyncio.Event()
 
     def add_task(self, coro: Callable, *args: Any) -> None:
         """Add a coroutine function and its arguments to the controller"""
@@ -18,25 +19,35 @@ class AsyncioController:
 
     async def run_tasks(self) -> None:
         """Run single or multiple tasks"""
-        self.tasks = []  # Clear the previous tasks list
-        for coro, args in self.coros:
-            task = asyncio.create_task(coro(*args), name=f"{coro.__name__}({args})")
-            self.tasks.append(task)
-            if self.verbose:
-                logging.info(f'Running task: {task.get_name()}')
+        # gather rather than a TaskGroup on every Python version: a failing task raises its own
+        # exception (not an ExceptionGroup) and does not cancel the other tasks
+        create_task = asyncio.create_task
+        self.tasks = [create_task(coro(*args), name=f"{coro.__name__}({args})") for coro, args in self.coros]
+        self._log_running()
         await asyncio.gather(*self.tasks)
         if self.verbose:
             logging.info('All tasks have been completed.')
 
+    def _log_running(self) -> None:
+        if self.verbose:
+            for task in self.tasks:
+                logging.info(f'Running task: {task.get_name()}')
+
     async def monitor_tasks(self) -> None:
-        """Monitor the tasks"""
-        while not self.stop:
-            pending = [task for task in self.tasks if not task.done()]
-            if self.verbose:
-                logging.info(f"Pending tasks: {len(pending)}")
-            if not pending:
-                break
-            await asyncio.sleep(1)
+        """Monitor the tasks until they all finish or monitoring is stopped"""
+        stop_wait = asyncio.create_task(self._stop.wait())
+        try:
+            pending = {task for task in self.tasks if not task.done()}
+            while not self._stop.is_set():
+                if self.verbose:
+                    logging.info(f"Pending tasks: {len(pending)}")
+                if not pending:
+                    break
+                # Wake up as soon as a task finishes or stop_monitoring() is called
+                await asyncio.wait({*pending, stop_wait}, return_when=asyncio.FIRST_COMPLETED)
+                pending = {task for task in pending if not task.done()}
+        finally:
+            stop_wait.cancel()
 
     def cancel_tasks(self, tasks: List[asyncio.Task] = None) -> None:
         """Cancel single or multiple tasks"""
@@ -51,5 +62,6 @@ class AsyncioController:
     def stop_monitoring(self) -> None:
         """Stop the monitoring of tasks"""
         self.stop = True
+        self._stop.set()
         if self.verbose:
             logging.info('Stopped monitoring tasks.')
\ No newline at end of file
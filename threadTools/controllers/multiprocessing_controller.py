@@ -1,15 +1,24 @@
+import concurrent.futures
+import functools
 import logging
-import multiprocessing
-from typing import List, Callable, Any, Tuple
+import os
+import weakref
+from multiprocessing.connection import wait
+from typing import List, Callable, Any, Tuple, Optional
 
 # Multiprocessing Manager
 class MultiprocessingController:
     """method must be put at the toppest level of the module
     """
-    def __init__(self, verbose: bool = False):
+    def __init__(self, verbose: bool = False, max_workers: Optional[int] = None):
         self.tasks: List[Tuple[Callable, Tuple[Any, ...]]] = []
-        self.processes: List[multiprocessing.Process] = []
+        self.futures: List[concurrent.futures.Future] = []
         self.verbose = verbose
+        self.max_workers = max_workers or os.cpu_count()
+        # Worker processes are created once and reused across run_tasks() calls
+        self._pool: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        # Futures whose workers terminate_tasks() killed, their BrokenProcessPool errors are expected
+        self._terminated = weakref.WeakSet()
 
     def log(self, message: str, level=logging.INFO):
         if self.verbose:
@@ -22,39 +31,71 @@ class MultiprocessingController:
             logging.info(f'Added task: {func.__name__} with arguments: {args}')
 
     def run_tasks(self) -> None:
-        """Run all tasks in separate processes"""
-        self.processes = []  # Clear the previous processes list
+        """Run all tasks in the worker process pool"""
+        if self._pool is None:
+            self._pool = concurrent.futures.ProcessPoolExecutor(max_workers=self.max_workers)
+        submit = self._pool.submit
+        self.futures = []
         for func, args in self.tasks:
-            p = multiprocessing.Process(target=func, args=args, name=f"{func.__name__}({args})")
-            self.processes.append(p)
-            if self.verbose:
-                logging.info(f'Starting process: {p.name}')
-            p.start()
+            future = submit(func, *args)
+            # The pool keeps a task's exception in its future, log it like a crashed child process would
+            future.add_done_callback(functools.partial(self._report_failure, f'{func.__name__}({args})'))
+            self.futures.append(future)
+        if self.verbose:
+            for func, args in self.tasks:
+                logging.info(f'Submitted task: {func.__name__}({args})')
+
+    def _report_failure(self, name: str, future: concurrent.futures.Future) -> None:
+        if future.cancelled() or future in self._terminated:
+            return
+        exception = future.exception()
+        if exception is not None:
+            logging.error(f'Task {name} failed: {exception!r}', exc_info=exception)
 
     def monitor_tasks(self) -> None:
-        """Monitor the processes"""
+        """Monitor the tasks until all of them have finished"""
         try:
-            while True:
-                alive_processes = [p for p in self.processes if p.is_alive()]
+            not_done = set(self.futures)
+            while not_done:
                 if self.verbose:
-                    logging.info(f"Alive processes: {len(alive_processes)}")
-                if not alive_processes:
-                    break
-                for p in alive_processes:
-                    p.join(timeout=1)
+                    logging.info(f"Unfinished tasks: {len(not_done)}")
+                # Blocks until at least one task finishes, no polling interval
+                _, not_done = concurrent.futures.wait(not_done, return_when=concurrent.futures.FIRST_COMPLETED)
+            if self.verbose:
+                logging.info("Unfinished tasks: 0")
         except KeyboardInterrupt:
             if self.verbose:
                 logging.info("Monitoring interrupted by user.")
             self.terminate_tasks()
 
     def terminate_tasks(self) -> None:
-        """Terminate all running processes"""
-        for p in self.processes:
-            if p.is_alive():
-                p.terminate()
-                if self.verbose:
-                    logging.info(f'Terminated process: {p.name}')
-        self.processes = [p for p in self.processes if p.is_alive()]
+        """Cancel pending tasks and terminate the workers of running ones"""
+        running = [f for f in self.futures if not f.cancel() and not f.done()]
+        if self._pool is not None:
+            # shutdown() cannot stop tasks that are already running, so their workers are terminated directly.
+            # The executor has no public API for its worker processes; _processes is a CPython implementation detail
+            processes = getattr(self._pool, '_processes', None) or {}
+            workers = list(processes.values()) if running else []
+            self._terminated.update(running)
+            self._pool.shutdown(wait=not workers, cancel_futures=True)
+            for p in workers:
+                if p.is_alive():
+                    p.terminate()
+                    if self.verbose:
+                        logging.info(f'Terminated process: {p.name}')
+            # Wait on all worker sentinels at once rather than joining them one by one
+            sentinels = [p.sentinel for p in workers]
+            while sentinels:
+                for s in wait(sentinels):
+                    sentinels.remove(s)
+            self._pool = None
+        self.futures = [f for f in self.futures if not f.done()]
+
+    def close(self) -> None:
+        """Shut down the worker pool after the submitted tasks finish"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
         
 def example_task_for_multiprocessing(name: str, duration: int) -> None:
     import time
@@ -1,9 +1,13 @@
 import logging
 import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 from typing import List, Callable, Any
 
 # MyThread and MultiThreadManager for managing threads
 class MyThread(threading.Thread):
+    # threading.Thread keeps its own __dict__; the slots only cover the attributes added here
+    __slots__ = ('index', 'func', 'args', 'kwargs', 'result', 'exception', 'verbose')
+
     def __init__(self, index, func, args=(), kwargs={}, verbose=False):
         super(MyThread, self).__init__()
         self.index = index
@@ -23,27 +27,51 @@ class MyThread(threading.Thread):
             self.exception = e
         if self.verbose:
             logging.info(f"Thread {self.index} finished.")
-            
+
+def _run_logged(index, func, args, kwargs):
+    logging.info(f"Thread {index} started.")
+    try:
+        return func(*args, **kwargs)
+    finally:
+        logging.info(f"Thread {index} finished.")
+
 class MultiThreadManager:
-    def __init__(self, verbose=False):
-        self.threads = []
+    """Run queued calls on a shared ThreadPoolExecutor.
+
+    At most max_workers calls run at once (the executor default is min(32, os.cpu_count() + 4)),
+    not one thread per task as before. Tasks that wait on each other can deadlock once every
+    worker is blocked; pass a max_workers at least as large as the number of such tasks.
+    """
+    def __init__(self, verbose=False, max_workers=None):
+        # Worker threads are recycled by the executor instead of creating one MyThread per task
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._calls = []  # (func, args, kwargs) waiting for start_threads()
+        self._futures = []
         self.verbose = verbose
 
     def add_thread(self, func, args=(), kwargs={}):
-        index = len(self.threads)  # Current thread index
-        thread = MyThread(index, func, args, kwargs, verbose=self.verbose)
-        self.threads.append(thread)
-        return thread
+        """Queue a call and return its index in the results list.
+
+        This used to return a MyThread and append it to a public threads list; neither exists
+        any more, so callers that join() or inspect the returned thread must use
+        wait_for_threads() / get_results_in_order() instead.
+        """
+        self._calls.append((func, args, kwargs))
+        return len(self._calls) - 1
 
     def start_threads(self):
         if self.verbose:
             logging.info("Starting all threads.")
-        for thread in self.threads:
-            thread.start()
+        submit = self._executor.submit
+        for index in range(len(self._futures), len(self._calls)):
+            func, args, kwargs = self._calls[index]
+            if self.verbose:
+                self._futures.append(submit(_run_logged, index, func, args, kwargs))
+            else:
+                self._futures.append(submit(func, *args, **kwargs))
 
     def wait_for_threads(self):
-        for thread in self.threads:
-            thread.join()
+        wait(self._futures)
         if self.verbose:
             logging.info("All threads have completed.")
 
@@ -52,24 +80,27 @@ class MultiThreadManager:
         if self.verbose:
             logging.info("Collecting results from threads.")
         self.wait_for_threads()
-        results = [None] * len(self.threads)
+        results = [None] * len(self._futures)
         exceptions = []
 
-        for thread in self.threads:
-            if thread.exception is not None:
-                exceptions.append((thread.index, thread.exception))
+        for index, future in enumerate(self._futures):
+            exception = future.exception()
+            if exception is not None:
+                exceptions.append(exception)
                 if self.verbose:
-                    logging.error(f"Exception from thread {thread.index}: {thread.exception}")
+                    logging.error(f"Exception from thread {index}: {exception}")
             else:
-                results[thread.index] = thread.result
+                results[index] = future.result()
                 if self.verbose:
-                    logging.info(f"Result collected from thread {thread.index}.")
+                    logging.info(f"Result collected from thread {index}.")
 
         if exceptions:
-            exceptions.sort(key=lambda x: x[0])
-            if self.verbose:
-                logging.info("Exceptions sorted by index.")
-            return (results, [ex[1] for ex in exceptions])
+            # Futures are visited in index order, so the exceptions are already sorted by index
+            return (results, exceptions)
         if self.verbose:
             logging.info("All results collected with no exceptions.")
-        return (results, None)
\ No newline at end of file
+        return (results, None)
+
+    def close(self):
+        """Shut down the worker threads once the submitted calls finish"""
+        self._executor.shutdown(wait=True)
\ No newline at end of file
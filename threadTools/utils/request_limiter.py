@@ -1,10 +1,23 @@
 import asyncio
 import aiohttp
 import requests
+from requests.adapters import HTTPAdapter
 import time
 import threading
-import queue
+import collections
+import heapq
 import logging
+from typing import Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# A failed URL is retried at most this many times, waiting min(2 ** attempts, 60) seconds before each retry
+MAX_RETRIES = 5
+# The queues hold at most this many minutes of requests, after which make_request blocks until there is room
+QUEUE_MINUTES = 10
+
+def _backoff(attempts: int) -> float:
+    return min(2 ** attempts, 60)
 
 class RequestLimiter:
     def __init__(self, max_requests_per_minute: int = 20, verbose: bool = False):
@@ -14,60 +27,131 @@ class RequestLimiter:
             max_requests_per_minute (int, optional): Use to setup requests per minute. Defaults to 20. Recommend to be lower than 20.
             verbose (bool, optional): Use to decide whether to show info or not. Defaults to True.
         """
-        self.request_count = 0
-        self.last_request_time = 0
-        self.request_queue = queue.Queue()
-        self.lock = threading.Lock()
+        # deque append/popleft are atomic, the event only wakes the monitor when the deque was empty
+        self.request_queue = collections.deque()
+        self._not_empty = threading.Event()
+        # Free places in the deque; make_request takes one and the monitor gives it back when the URL leaves
+        self._slots = threading.Semaphore(max_requests_per_minute * QUEUE_MINUTES)
+        # Failed URLs waiting for their backoff, as (not_before, attempts, url); only the monitor thread touches it
+        self._retries = []
         self.max_requests_per_minute = max_requests_per_minute
+        # Seconds needed to refill one token, computed once instead of on every request
+        self._interval = 60.0 / max_requests_per_minute
         self.verbose = verbose
+        # One pooled session so consecutive requests reuse keep-alive connections
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_requests_per_minute, pool_maxsize=max_requests_per_minute)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
         
-        # Start the thread to monitor requests
-        threading.Thread(target=self.monitor_requests, daemon=True).start()
+        # Start the thread to monitor requests, close() stops it through this event
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self.monitor_requests, daemon=True)
+        self._thread.start()
     
-    def log(self, message: str, level=logging.INFO):
-        if self.verbose:
-            logging.log(level, message)
+    def _check_running(self) -> None:
+        if self._stop.is_set() or not self._thread.is_alive():
+            raise RuntimeError('RequestLimiter is closed or its monitor thread has stopped')
+    
+    def _wait_for_slot(self) -> None:
+        """Block until the queue has room, raising if the monitor can no longer drain it."""
+        # Only a full queue gets here, so waking once a second to re-check the monitor costs nothing otherwise
+        while not self._slots.acquire(timeout=1):
+            self._check_running()
     
     def make_request(self, url: str) -> None:
-        """Add a new request URL to the queue."""
-        self.request_queue.put(url)
-        self.log(f'Added URL to queue: {url}')
+        """Add a new request URL to the queue, blocking while the queue is full."""
+        self._check_running()
+        if not self._slots.acquire(blocking=False):
+            self._wait_for_slot()
+        self.request_queue.append(url)
+        self._not_empty.set()
+        if self.verbose:
+            logger.info('Added URL to queue: %s', url)
+    
+    def make_requests(self, urls: Iterable[str]) -> None:
+        """Add a batch of request URLs to the queue, waking the monitor once unless the queue fills up."""
+        self._check_running()
+        count = 0
+        for url in urls:
+            if not self._slots.acquire(blocking=False):
+                # Let the monitor drain what is already queued before waiting for room
+                self._not_empty.set()
+                self._wait_for_slot()
+            self.request_queue.append(url)
+            count += 1
+        self._not_empty.set()
+        if self.verbose:
+            logger.info('Added %d URLs to queue', count)
+    
+    def close(self) -> None:
+        """Stop the monitor thread and close the pooled connections held by the session."""
+        self._stop.set()
+        # Wake the monitor if it is waiting for URLs
+        self._not_empty.set()
+        self._thread.join()
+        self._session.close()
+    
+    def _next_url(self) -> Optional[Tuple[str, int]]:
+        """Block until a URL is ready and return it with its attempt count, or None once closed."""
+        while not self._stop.is_set():
+            # Retries whose backoff has passed go before newly queued URLs
+            if self._retries and self._retries[0][0] <= time.monotonic():
+                _, attempts, url = heapq.heappop(self._retries)
+                return url, attempts
+            if self.request_queue:
+                url = self.request_queue.popleft()
+                self._slots.release()
+                return url, 0
+            self._not_empty.clear()
+            # Re-check after clearing so an append or close() made in between is not missed
+            if self.request_queue or self._stop.is_set():
+                continue
+            # Sleep until a new URL arrives or the earliest retry becomes due
+            self._not_empty.wait(self._retries[0][0] - time.monotonic() if self._retries else None)
+        return None
     
     def monitor_requests(self) -> None:
         """Monitor and process the requests from the queue."""
-        while True:
-            current_time = time.time()
+        # Only this thread touches the token bucket, so it lives in locals and needs no lock
+        # It holds up to max_requests_per_minute requests, refilled at the per-minute rate
+        tokens = float(self.max_requests_per_minute)
+        last = time.monotonic()
+        interval = self._interval
+        while not self._stop.is_set():
+            item = self._next_url()
+            if item is None:
+                break
+            url, attempts = item
             
-            with self.lock:
-                # Reset request count if more than a minute has passed since the last request
-                if current_time - self.last_request_time > 60:
-                    self.request_count = 0
-            
-            # If the request limit is reached, wait before processing more requests
-            if self.request_count >= self.max_requests_per_minute:
-                time.sleep(1)
-                continue
+            # Refill for the time since the last request, then take a token
+            # Failed attempts use up a token too, so retries stay within the limit
+            now = time.monotonic()
+            tokens = min(self.max_requests_per_minute, tokens + (now - last) / interval)
+            last = now
+            tokens -= 1
+            if tokens < 0:
+                # Bucket was empty, wait until the token just taken has been refilled or close() is called
+                if self._stop.wait(-tokens * interval):
+                    break
             
             try:
-                # Get the next URL from the queue
-                url = self.request_queue.get(timeout=1)
-            except queue.Empty:
-                time.sleep(1)
-                continue
-            
-            response = requests.get(url)
+                status = self._session.get(url, timeout=10).status_code
+            except requests.RequestException as e:
+                # Connection errors and timeouts are retried like error statuses instead of killing the monitor
+                status = None
+                logger.warning('Error fetching URL %s: %s', url, e)
             
-            with self.lock:
-                if response.status_code == 200:
-                    self.request_count += 1
-                    self.last_request_time = current_time
-                    self.log(f'Successfully fetched URL: {url}')
-                else:
-                    # Re-add the URL to the queue if the request failed
-                    self.request_queue.put(url)
-                    self.log(f'Failed to fetch URL, re-added to queue: {url}', level=logging.WARNING)
-            
-            time.sleep(60/self.max_requests_per_minute)  # Simulate interval between requests
+            if status == 200:
+                if self.verbose:
+                    logger.info('Successfully fetched URL: %s', url)
+            elif attempts < MAX_RETRIES:
+                # Retry the URL after an exponential backoff instead of straight away
+                delay = _backoff(attempts)
+                heapq.heappush(self._retries, (time.monotonic() + delay, attempts + 1, url))
+                logger.warning('Failed to fetch URL, retrying in %ss: %s', delay, url)
+            else:
+                logger.warning('Failed to fetch URL, giving up after %d retries: %s', attempts, url)
             
 class AsyncioRequestLimiter:
     def __init__(self, max_requests_per_minute: int = 20, verbose: bool = False):
@@ -78,57 +162,131 @@ class AsyncioRequestLimiter:
             max_requests_per_minute (int, optional): Maximum number of requests per minute. Defaults to 20.
             verbose (bool, optional): If True, log detailed information. Defaults to False.
         """
-        self.request_count = 0
-        self.last_request_time = 0
-        self.request_queue = asyncio.Queue()
-        self.lock = asyncio.Lock()
+        self.request_queue = asyncio.Queue(maxsize=max_requests_per_minute * QUEUE_MINUTES)
         self.max_requests_per_minute = max_requests_per_minute
+        # Seconds needed to refill one token, computed once instead of on every request
+        self._interval = 60.0 / max_requests_per_minute
         self.verbose = verbose
+        # Token bucket holding up to max_requests_per_minute requests, refilled at the per-minute rate
+        self._tokens = float(max_requests_per_minute)
+        self._last = time.monotonic()
+        # One pooled session for all requests, created lazily inside the running loop
+        self._session: Optional[aiohttp.ClientSession] = None
+        # Retries still waiting for room in a full queue, kept referenced until they are queued
+        self._pending_retries = set()
+        # Timers of retries still in their backoff, cancelled by close()
+        self._retry_timers = set()
+        self._closed = False
         
-        # Start the task to monitor requests
-        asyncio.create_task(self.monitor_requests())
+        # Start one worker per request allowed in a minute, they share the token bucket
+        self._workers = [asyncio.create_task(self.monitor_requests()) for _ in range(max_requests_per_minute)]
     
-    def log(self, message: str, level=logging.INFO):
-        if self.verbose:
-            logging.log(level, message)
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Return the shared session, creating it on first use."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_requests_per_minute,
+                limit_per_host=self.max_requests_per_minute,
+                ttl_dns_cache=300,
+                keepalive_timeout=60,
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+    
+    async def _acquire_slot(self) -> None:
+        """Take a token from the shared bucket, sleeping until it is refilled if the bucket is empty."""
+        # No await until the token is taken, so workers on the same loop cannot interleave here
+        # Failed attempts use up a token too, so retries stay within the limit
+        now = time.monotonic()
+        self._tokens = min(self.max_requests_per_minute, self._tokens + (now - self._last) / self._interval)
+        self._last = now
+        # A negative balance reserves tokens for workers that are still sleeping
+        self._tokens -= 1
+        delay = -self._tokens * self._interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+    
+    async def _do_get(self, url: str) -> int:
+        """Fetch the URL with the shared session and return the status code."""
+        async with self._get_session().get(url) as response:
+            return response.status
+    
+    def _schedule_retry(self, delay: float, item: Tuple[str, int]) -> None:
+        """Put the URL back after the backoff, keeping the timer so close() can cancel it."""
+        def fire() -> None:
+            self._retry_timers.discard(timer)
+            self._requeue(item)
+        timer = asyncio.get_running_loop().call_later(delay, fire)
+        self._retry_timers.add(timer)
+    
+    def _requeue(self, item: Tuple[str, int]) -> None:
+        """Put a retried URL back, waiting in the background if the queue is full."""
+        try:
+            self.request_queue.put_nowait(item)
+        except asyncio.QueueFull:
+            task = asyncio.ensure_future(self.request_queue.put(item))
+            self._pending_retries.add(task)
+            task.add_done_callback(self._pending_retries.discard)
+    
+    def _check_running(self) -> None:
+        if self._closed:
+            raise RuntimeError('AsyncioRequestLimiter is closed')
     
     async def make_request(self, url: str) -> None:
-        """Add a new request URL to the queue."""
-        await self.request_queue.put(url)
-        self.log(f'Added URL to queue: {url}')
+        """Add a new request URL to the queue, waiting while the queue is full."""
+        self._check_running()
+        await self.request_queue.put((url, 0))
+        if self.verbose:
+            logger.info('Added URL to queue: %s', url)
+    
+    async def make_requests(self, urls: Iterable[str]) -> None:
+        """Add a batch of request URLs to the queue."""
+        self._check_running()
+        count = 0
+        for url in urls:
+            # Only fall back to awaiting when the queue is full
+            try:
+                self.request_queue.put_nowait((url, 0))
+            except asyncio.QueueFull:
+                await self.request_queue.put((url, 0))
+            count += 1
+        if self.verbose:
+            logger.info('Added %d URLs to queue', count)
+    
+    async def close(self) -> None:
+        """Stop processing the queue and close the shared session."""
+        self._closed = True
+        for timer in self._retry_timers:
+            timer.cancel()
+        self._retry_timers.clear()
+        tasks = self._workers + list(self._pending_retries)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
     
     async def monitor_requests(self) -> None:
-        """Monitor and process the requests from the queue."""
+        """Worker loop: take URLs from the queue and fetch them in the next free slot."""
         while True:
-            current_time = time.time()
-            
-            async with self.lock:
-                # Reset request count if more than a minute has passed since the last request
-                if current_time - self.last_request_time > 60:
-                    self.request_count = 0
-            
-            # If the request limit is reached, wait before processing more requests
-            if self.request_count >= self.max_requests_per_minute:
-                await asyncio.sleep(1)
-                continue
+            # Block until a URL arrives instead of polling the queue
+            url, attempts = await self.request_queue.get()
+            await self._acquire_slot()
             
             try:
-                # Get the next URL from the queue
-                url = await asyncio.wait_for(self.request_queue.get(), timeout=1)
-            except asyncio.TimeoutError:
-                await asyncio.sleep(1)
-                continue
-            
-            async with self.lock:
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(url) as response:
-                        if response.status == 200:
-                            self.request_count += 1
-                            self.last_request_time = current_time
-                            self.log(f'Successfully fetched URL: {url}')
-                        else:
-                            # Re-add the URL to the queue if the request failed
-                            await self.request_queue.put(url)
-                            self.log(f'Failed to fetch URL, re-added to queue: {url}', level=logging.WARNING)
-            
-            await asyncio.sleep(60 / self.max_requests_per_minute)  # Simulate interval between requests
\ No newline at end of file
+                status = await self._do_get(url)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                # Connection errors and timeouts are retried like error statuses instead of ending this worker
+                status = None
+                logger.warning('Error fetching URL %s: %s', url, e)
+            if status == 200:
+                if self.verbose:
+                    logger.info('Successfully fetched URL: %s', url)
+            elif attempts < MAX_RETRIES:
+                # A timer puts the URL back after the backoff, so no worker sits idle waiting for it
+                delay = _backoff(attempts)
+                self._schedule_retry(delay, (url, attempts + 1))
+                logger.warning('Failed to fetch URL, retrying in %ss: %s', delay, url)
+            else:
+                logger.warning('Failed to fetch URL, giving up after %d retries: %s', attempts, url)
\ No newline at end of file
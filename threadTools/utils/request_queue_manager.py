@@ -1,32 +1,61 @@
 import threading
+from collections import deque
+
+# 最多保留多少個閒置的 Condition 供新的 request_key 重複使用
+CONDITION_POOL_SIZE = 1024
 
 class RequestQueueManager:
     def __init__(self):
-        self.active_requests = {}
+        self.active_requests = set()
         self.condition_locks = {}
+        # 每個 request_key 目前持有或等待中的線程數，只在該 key 的 Condition 內修改
+        self._refcount = {}
+        # 已清理 key 留下的 Condition，沒有線程在等待，可直接給新的 key 使用
+        self._idle_conditions = deque(maxlen=CONDITION_POOL_SIZE)
         self.global_lock = threading.Lock()
 
     def get_condition(self, request_key):
+        # 已存在的 key 直接讀取，不經過 global_lock
+        condition = self.condition_locks.get(request_key)
+        if condition is not None:
+            return condition
         with self.global_lock:
-            if request_key not in self.condition_locks:
-                self.condition_locks[request_key] = threading.Condition()
-            return self.condition_locks[request_key]
+            condition = self.condition_locks.get(request_key)
+            if condition is None:
+                condition = self._idle_conditions.pop() if self._idle_conditions else threading.Condition()
+                self.condition_locks[request_key] = condition
+            return condition
 
     def inqueue(self, request_key):
-        condition = self.get_condition(request_key)
-        with condition:
-            while request_key in self.active_requests:
-                condition.wait()  # 只等待相同 request_key 的 Condition
-            self.active_requests[request_key] = True
+        while True:
+            condition = self.get_condition(request_key)
+            with condition:
+                if self.condition_locks.get(request_key) is not condition:
+                    continue  # 取得後已被 dequeue 清掉或轉給其他 key，改用新的 Condition
+                self._refcount[request_key] = self._refcount.get(request_key, 0) + 1
+                while request_key in self.active_requests:
+                    condition.wait()  # 只等待相同 request_key 的 Condition
+                self.active_requests.add(request_key)
+                return
 
     def dequeue(self, request_key):
-        condition = self.get_condition(request_key)
-        with condition:
-            if request_key in self.active_requests:
-                del self.active_requests[request_key]
-                condition.notify_all()  # 喚醒等待這個 request_key 的線程
-
-        with self.global_lock:
-            # 清理不再需要的 condition_locks
-            if request_key in self.condition_locks and not self.active_requests.get(request_key):
-                del self.condition_locks[request_key]
\ No newline at end of file
+        while True:
+            condition = self.condition_locks.get(request_key)
+            if condition is None:
+                return
+            with condition:
+                if self.condition_locks.get(request_key) is not condition:
+                    continue  # 取得後已被清掉或轉給其他 key，不能在舊的 Condition 上修改狀態
+                if request_key in self.active_requests:
+                    self.active_requests.remove(request_key)
+                    refcount = self._refcount[request_key] - 1
+                    if refcount:
+                        self._refcount[request_key] = refcount
+                        condition.notify_all()  # 喚醒等待這個 request_key 的線程
+                    else:
+                        # 沒有線程在等待，清理不再需要的 condition_locks
+                        del self._refcount[request_key]
+                        with self.global_lock:
+                            del self.condition_locks[request_key]
+                            self._idle_conditions.append(condition)
+                return
\ No newline at end of file
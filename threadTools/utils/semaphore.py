@@ -6,14 +6,25 @@ class Semaphore:
         self.lock = threading.Lock()
         self.value = initial
         self.condition = threading.Condition(self.lock)
+        self._waiters = 0  # threads blocked in acquire(), guarded by self.lock
 
     def acquire(self):
-        with self.condition:
-            while self.value == 0:
-                self.condition.wait()
+        with self.lock:
+            # Fast path: take a free slot without touching the condition
+            if self.value > 0:
+                self.value -= 1
+                return
+            self._waiters += 1
+            try:
+                while self.value == 0:
+                    self.condition.wait()
+            finally:
+                self._waiters -= 1
             self.value -= 1
 
     def release(self):
-        with self.condition:
+        with self.lock:
             self.value += 1
-            self.condition.notify()
\ No newline at end of file
+            # Skip the wakeup entirely when nobody is waiting
+            if self._waiters:
+                self.condition.notify()
\ No newline at end of file